@@ -1,47 +1,389 @@
 #!/usr/bin/env python3
 """
 Chatterbox TTS Example Usage
-Run: ./venv/bin/python chatterbox_example.py [--voice reference_audio.wav]
+Run: ./venv/bin/python chatterbox_example.py [--voice reference_audio.wav] [--engine trt]
+Keep the model loaded between runs: ./venv/bin/python chatterbox_example.py --serve [--engine trt]
 """
-from chatterbox.tts import ChatterboxTTS
-import torchaudio as ta
-import torch
-import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+import argparse
+import contextlib
+import functools
+import http.client
+import importlib.util
+import json
+import socket
+import socketserver
+import stat
 import os
 
-def main():
+# The model stack (torch, chatterbox, huggingface_hub) is imported only on the
+# model-loading path, so a client talking to a running server never pays for it.
+# Environment settings those packages read at import time go here, first.
+
+# Download weights over parallel connections when hf_transfer is installed
+if importlib.util.find_spec("hf_transfer"):
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
+# Let the CUDA caching allocator grow segments in place instead of fragmenting
+# across varying-length generations
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True,max_split_size_mb:512")
+
+# Unix socket the resident model server listens on
+SOCKET_PATH = os.environ.get("CHATTERBOX_SOCKET", "/tmp/chatterbox.sock")
+
+# Checkpoint files ChatterboxTTS.from_pretrained loads from the Hub
+MODEL_FILES = ["ve.safetensors", "t3_cfg.safetensors", "s3gen.safetensors", "tokenizer.json", "conds.pt"]
+
+# Emotion mapping for voice assistant context
+EMOTION_PRESETS = {
+    "neutral": {"exaggeration": 0.3, "cfg_weight": 1.0},
+    "happy": {"exaggeration": 0.7, "cfg_weight": 1.2},
+    "excited": {"exaggeration": 0.9, "cfg_weight": 1.5},
+    "sad": {"exaggeration": 0.5, "cfg_weight": 0.7},
+    "calm": {"exaggeration": 0.1, "cfg_weight": 0.8},
+    "serious": {"exaggeration": 0.2, "cfg_weight": 1.3},
+    "empathetic": {"exaggeration": 0.4, "cfg_weight": 0.9},
+    "curious": {"exaggeration": 0.6, "cfg_weight": 1.1}
+}
+
+# Presets resolved once to (exaggeration, cfg_weight) tuples for the generation path
+PRESET_SETTINGS = {
+    emotion: (settings["exaggeration"], settings["cfg_weight"])
+    for emotion, settings in EMOTION_PRESETS.items()
+}
+
+def configure_torch():
+    """Import torch and apply process-wide inference settings before any model loads"""
+    import torch
+
+    # Let matmuls/convs use TF32 TensorCores. cuDNN benchmark stays off: every utterance
+    # has a new length, so it would re-autotune the convolutions on each request.
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+    torch.set_float32_matmul_precision("high")
+
+    # Nothing here trains, so never record autograd state
+    torch.set_grad_enabled(False)
+    return torch
+
+@functools.cache
+def cpu_supports_bf16():
+    """Whether the CPU has native BF16 matmuls (AVX512_BF16); the check is private, so guard it"""
+    import torch
+    check = getattr(torch.cpu, "_is_avx512_bf16_supported", None)
+    return bool(check and check())
+
+def autocast(fn, device, dtype):
+    """Wrap fn so every call runs under torch.autocast on device in dtype"""
+    import torch
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with torch.autocast(device, dtype=dtype):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def compile_module(module, engine, cuda_graphs=False):
+    """Compile a CUDA module with Inductor or as TensorRT FP16 engines"""
+    import torch
+    if engine == "trt":
+        # Importing torch_tensorrt registers its torch.compile backend. The decode
+        # step's KV cache grows every token, so shapes stay dynamic.
+        import torch_tensorrt  # noqa: F401
+        return torch.compile(
+            module,
+            backend="torch_tensorrt",
+            dynamic=True,
+            options={"enabled_precisions": {torch.float16}}
+        )
+
+    # reduce-overhead records one CUDA graph per distinct input shape and replays it,
+    # which only pays off for modules called repeatedly at the same shape
+    if cuda_graphs:
+        return torch.compile(module, mode="reduce-overhead", fullgraph=False)
+
+    # Fused kernels without graph capture; dynamic shapes avoid a recompile per length
+    return torch.compile(module, dynamic=True, fullgraph=False)
+
+def write_wav(filename, samplerate, wav):
+    """Write a float waveform to filename as 16-bit PCM"""
+    import numpy as np
+    import soundfile as sf
+
+    # Convert here rather than in libsndfile: round to nearest (a plain cast truncates
+    # toward zero and biases quiet samples) and clip peaks instead of wrapping them
+    pcm = np.rint(wav * 32767).clip(-32768, 32767).astype(np.int16)
+    try:
+        sf.write(filename, pcm, samplerate, subtype="PCM_16")
+    except BaseException:
+        # Never leave a truncated WAV behind for a failed write
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(filename)
+        raise
+
+class ChatterboxServer:
+    """Loads Chatterbox once and keeps it resident for repeated generation"""
+
+    def __init__(self, device, engine="inductor"):
+        torch = configure_torch()
+        from chatterbox.tts import REPO_ID, ChatterboxTTS
+        from huggingface_hub import snapshot_download
+
+        self.device = device
+
+        # Fetch every checkpoint file in one parallel download; from_pretrained
+        # would otherwise pull them one at a time on first run
+        snapshot_download(REPO_ID, allow_patterns=MODEL_FILES, max_workers=8)
+
+        print("Loading Chatterbox model...")
+        self.model = ChatterboxTTS.from_pretrained(device=device)
+
+        if device == "cpu":
+            # PyTorch defaults to one thread per physical core, but some installs start
+            # with one; only then widen to the CPUs this process may run on
+            if torch.get_num_threads() == 1:
+                cpus = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+                torch.set_num_threads(len(cpus) if cpus else os.cpu_count())
+
+            # BF16 autocast for the T3 decoder only: HiFiGAN's iSTFT builds complex
+            # tensors, which torch.complex cannot make from BF16
+            if cpu_supports_bf16():
+                self.model.t3.inference = autocast(self.model.t3.inference, device, torch.bfloat16)
+
+        if device == "cuda":
+            model = self.model
+
+            # Keep the T3 decoder weights in FP16: decoding is memory-bound, so halving the
+            # bytes read per step roughly halves its latency. Only T3 runs under autocast,
+            # which casts its FP32 speaker conditioning at each matmul. S3Gen and the voice
+            # encoder keep FP32 weights and compute: S3Gen casts its inputs to the flow's
+            # dtype, and its HiFiGAN iSTFT needs complex tensors, which half barely supports.
+            model.t3.half().eval()
+            model.t3.inference = autocast(model.t3.inference, device, torch.float16)
+
+            # Compile the per-step hot paths. The T3 Llama backbone runs once per speech
+            # token against a KV cache that grows every step, so it never repeats a shape
+            # and gets no CUDA graphs. The S3Gen flow estimator runs every CFM step of an
+            # utterance at the same mel length, so its recorded graph is replayed.
+            print(f"Compiling model with {engine} (first generation will be slow)...")
+            model.t3.tfmr = compile_module(model.t3.tfmr, engine)
+            estimator = model.s3gen.flow.decoder.estimator
+            model.s3gen.flow.decoder.estimator = compile_module(estimator, engine, cuda_graphs=True)
+
+            # Warm up once so compilation happens before real requests; the estimator
+            # still records a new graph the first time it sees each mel length
+            with torch.inference_mode():
+                model.generate("warmup warmup warmup", exaggeration=0.3, cfg_weight=1.0)
+
+        # (mtime, conditionals) per voice reference path; an edited clip replaces its
+        # entry instead of adding one. None is the model's built-in voice.
+        self._voice_conds = {None: (None, self.model.conds)}
+
+        # Files are encoded and written on these threads so disk I/O overlaps the
+        # next generation; futures are kept until flush() collects them
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+        self._pending_writes = []
+
+    def _use_voice(self, voice_ref):
+        """Point the model at voice_ref's conditionals, encoding the clip only once"""
+        voice_ref = voice_ref or None
+        mtime = voice_ref and os.path.getmtime(voice_ref)
+        cached = self._voice_conds.get(voice_ref)
+        if cached is None or cached[0] != mtime:
+            print(f"🎤 Encoding voice reference: {voice_ref}")
+            self.model.prepare_conditionals(voice_ref)
+            cached = self._voice_conds[voice_ref] = (mtime, self.model.conds)
+        self.model.conds = cached[1]
+
+    def generate(self, text, emotion, voice_ref=None):
+        """Synthesize text with an emotion preset, optionally cloning voice_ref"""
+        import torch
+        exaggeration, cfg_weight = PRESET_SETTINGS[emotion]
+        with torch.inference_mode():
+            self._use_voice(voice_ref)
+            return self.model.generate(text, exaggeration=exaggeration, cfg_weight=cfg_weight)
+
+    def synthesize(self, text, emotion, filename, voice_ref=None):
+        """Generate speech for text, then write it to filename in the background (see flush)"""
+        # Generate (resolving the preset and voice conditionals) before the writer is
+        # queued, so a failed generation never creates the output file
+        wav = self.generate(text, emotion, voice_ref).squeeze(0).float().cpu().numpy()
+        self._pending_writes.append(self._io_pool.submit(write_wav, filename, self.model.sr, wav))
+
+    def flush(self):
+        """Wait until every queued file is written, re-raising the first write error"""
+        pending, self._pending_writes = self._pending_writes, []
+        for future in pending:
+            future.result()
+
+    def serve(self, socket_path=SOCKET_PATH):
+        """Answer POST /generate requests on a Unix socket until interrupted"""
+        if server_running(socket_path):
+            print(f"❌ A Chatterbox server is already listening on {socket_path}")
+            return
+        if os.path.lexists(socket_path):
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                print(f"❌ {socket_path} exists and is not a socket; refusing to replace it")
+                return
+            # Left behind by a server that did not shut down cleanly
+            os.unlink(socket_path)
+
+        # Requests are handled one at a time; the model is not safe to share across threads
+        with _UnixHTTPServer(socket_path, _GenerateHandler) as httpd:
+            httpd.tts = self
+            print(f"🚀 Chatterbox server listening on {socket_path}")
+            try:
+                httpd.serve_forever()
+            except KeyboardInterrupt:
+                print("\nShutting down")
+            finally:
+                os.unlink(socket_path)
+                self._io_pool.shutdown()
+
+class _UnixHTTPServer(socketserver.UnixStreamServer):
+    tts = None
+
+class _GenerateHandler(BaseHTTPRequestHandler):
+    def address_string(self):
+        # Unix socket peers have no (host, port) address to log
+        return "unix-socket"
+
+    def do_POST(self):
+        if self.path != "/generate":
+            self._reply(404, {"error": f"Unknown path: {self.path}"})
+            return
+
+        # Reject malformed requests and unknown presets before touching the model
+        try:
+            length = int(self.headers["Content-Length"])
+            if length < 0:
+                # rfile.read(-1) would block until the client hangs up, stalling the server
+                raise ValueError(f"negative Content-Length: {length}")
+            request = json.loads(self.rfile.read(length))
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+            missing = [field for field in ("text", "emotion", "filename") if field not in request]
+        except (TypeError, ValueError) as e:
+            self._reply(400, {"error": f"Invalid request body: {e}"})
+            return
+        if missing:
+            self._reply(400, {"error": f"Missing field(s): {', '.join(missing)}"})
+            return
+        if not isinstance(request["emotion"], str) or request["emotion"] not in PRESET_SETTINGS:
+            presets = ", ".join(EMOTION_PRESETS)
+            self._reply(400, {"error": f"Unknown emotion preset: {request['emotion']!r} (valid: {presets})"})
+            return
+
+        try:
+            self.server.tts.synthesize(
+                request["text"],
+                request["emotion"],
+                request["filename"],
+                voice_ref=request.get("voice_ref")
+            )
+            # The client reads the file once we reply, so it has to be complete
+            self.server.tts.flush()
+        except Exception as e:
+            self._reply(500, {"error": str(e)})
+            return
+
+        self._reply(200, {"filename": request["filename"]})
+
+    def _reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path):
+        super().__init__("localhost")
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+def server_running(socket_path=SOCKET_PATH):
+    """Check whether a ChatterboxServer is accepting connections on socket_path"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+def request_generation(text, emotion, filename, voice_ref=None, socket_path=SOCKET_PATH):
+    """Ask a running ChatterboxServer to synthesize text into filename"""
+    body = json.dumps({
+        "text": text,
+        "emotion": emotion,
+        "filename": os.path.abspath(filename),
+        "voice_ref": voice_ref and os.path.abspath(voice_ref)
+    })
+    conn = _UnixHTTPConnection(socket_path)
+    try:
+        conn.request("POST", "/generate", body, {"Content-Type": "application/json"})
+        response = conn.getresponse()
+        result = json.loads(response.read())
+    finally:
+        conn.close()
+
+    if response.status != 200:
+        raise RuntimeError(result["error"])
+
+def load_server(engine):
+    """Import the model stack and load a ChatterboxServer, or return None if engine can't run here"""
+    import torch
+
     # Check for GPU
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Using device: {device}")
     
+    if engine == "trt":
+        if device != "cuda":
+            print("❌ --engine trt needs a CUDA GPU")
+            return None
+        if not importlib.util.find_spec("torch_tensorrt"):
+            print("❌ --engine trt needs torch-tensorrt: ./venv/bin/pip install torch-tensorrt")
+            return None
+    
     if device == "cpu":
         print("⚠️ Warning: Running on CPU. Consider using GPU for better performance.")
+        if cpu_supports_bf16():
+            print("Using BF16 autocast for the T3 decoder (CPU supports AVX512_BF16)")
+    
+    return ChatterboxServer(device, engine)
+
+def main():
+    parser = argparse.ArgumentParser(description="Chatterbox TTS emotion examples")
+    parser.add_argument("--voice", help="reference audio to clone")
+    parser.add_argument("--serve", action="store_true", help="keep the model loaded and serve requests")
+    parser.add_argument("--engine", choices=["inductor", "trt"], default="inductor",
+                        help="GPU compile backend (ignored when a server is already running)")
+    args = parser.parse_args()
+    
+    if args.serve:
+        # Fail before loading the model; serve() repeats the check
+        if server_running():
+            print(f"❌ A Chatterbox server is already listening on {SOCKET_PATH}")
+            return
+        tts = load_server(args.engine)
+        if tts:
+            tts.serve()
+        return
     
     # Check for voice reference file
-    voice_ref_path = None
-    if len(sys.argv) > 2 and sys.argv[1] == "--voice":
-        voice_ref_path = sys.argv[2]
+    voice_ref_path = args.voice
+    if voice_ref_path:
         if not os.path.exists(voice_ref_path):
             print(f"❌ Voice reference file not found: {voice_ref_path}")
             return
         print(f"🎤 Using voice reference: {voice_ref_path}")
     
-    # Load model
-    print("Loading Chatterbox model...")
-    model = ChatterboxTTS.from_pretrained(device=device)
-    
-    # Emotion mapping for voice assistant context
-    emotion_presets = {
-        "neutral": {"exaggeration": 0.3, "cfg_weight": 1.0},
-        "happy": {"exaggeration": 0.7, "cfg_weight": 1.2},
-        "excited": {"exaggeration": 0.9, "cfg_weight": 1.5},
-        "sad": {"exaggeration": 0.5, "cfg_weight": 0.7},
-        "calm": {"exaggeration": 0.1, "cfg_weight": 0.8},
-        "serious": {"exaggeration": 0.2, "cfg_weight": 1.3},
-        "empathetic": {"exaggeration": 0.4, "cfg_weight": 0.9},
-        "curious": {"exaggeration": 0.6, "cfg_weight": 1.1}
-    }
-    
     # Example texts with different emotions
     examples = [
         {
@@ -76,40 +418,43 @@ def main():
         }
     ]
     
+    # Use a running server if there is one, otherwise load the model in-process
+    tts = None
+    if server_running():
+        print(f"🔌 Using Chatterbox server at {SOCKET_PATH}")
+        generate = request_generation
+    else:
+        tts = load_server(args.engine)
+        if not tts:
+            return
+        generate = tts.synthesize
+    
     # Generate examples
     for i, example in enumerate(examples, 1):
         emotion = example["emotion"]
-        settings = emotion_presets[emotion]
+        exaggeration, cfg_weight = PRESET_SETTINGS[emotion]
         
         print(f"\nGenerating example {i}: {emotion.upper()} emotion")
         print(f"Text: '{example['text'][:50]}...'")
-        print(f"Settings: exaggeration={settings['exaggeration']}, cfg_weight={settings['cfg_weight']}")
+        print(f"Settings: exaggeration={exaggeration}, cfg_weight={cfg_weight}")
         
         # Generate with or without voice reference
-        if voice_ref_path:
-            wav = model.generate(
-                example["text"],
-                audio_prompt_path=voice_ref_path,
-                exaggeration=settings["exaggeration"],
-                cfg_weight=settings["cfg_weight"]
-            )
-        else:
-            wav = model.generate(
-                example["text"],
-                exaggeration=settings["exaggeration"],
-                cfg_weight=settings["cfg_weight"]
-            )
-        
-        ta.save(example["filename"], wav, model.sr)
-        print(f"Saved: {example['filename']}")
+        generate(example["text"], emotion, example["filename"], voice_ref=voice_ref_path)
+        print(f"Generated: {example['filename']}")
+    
+    # Wait for background writes before reporting success
+    if tts:
+        tts.flush()
     
     print("\n✅ All examples generated successfully!")
     print("\n🎭 Emotion Presets Available:")
-    for emotion, settings in emotion_presets.items():
+    for emotion, settings in EMOTION_PRESETS.items():
         print(f"  • {emotion}: exaggeration={settings['exaggeration']}, cfg_weight={settings['cfg_weight']}")
     
     print("\n💡 Tips:")
     print("- Use --voice <file.wav> to clone a specific voice")
+    print("- Use --serve in another terminal to keep the model loaded between runs")
+    print("- Use --engine trt to run the hot paths as TensorRT FP16 engines (needs torch-tensorrt)")
     print("- Lower cfg_weight + higher exaggeration = more dramatic emotion")
     print("- Higher cfg_weight + lower exaggeration = more neutral tone")
     print("- Combine with LLM emotion detection for automatic emotion selection")